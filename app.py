@@ -16,16 +16,31 @@ Then open: http://localhost:5000
 """
 
 import os
+import re
 import sys
 import io
+import gzip
+import json
+import mmap
+import queue
 import uuid
 import hashlib
 import tempfile
+import threading
+import time
 import traceback
+from array import array
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
 
-from flask import Flask, request, jsonify, render_template_string, send_from_directory
+# Keep each Tesseract subprocess single-threaded so concurrent OCR workers
+# don't oversubscribe the CPU via OpenMP
+os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+
+from cachetools import LRUCache, TTLCache
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 
@@ -38,13 +53,47 @@ except ImportError:
     print("Warning: pdfplumber not available")
 
 try:
-    from pdf2image import convert_from_bytes
+    from pdf2image import convert_from_path
     import pytesseract
+    from PIL import ImageOps
     OCR_AVAILABLE = True
 except ImportError:
     OCR_AVAILABLE = False
     print("Warning: OCR dependencies not available")
 
+try:
+    import pypdfium2 as pdfium
+    PYPDFIUM_AVAILABLE = True
+except ImportError:
+    PYPDFIUM_AVAILABLE = False
+    print("Warning: pypdfium2 not available, using pdfplumber for text extraction")
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+    print("Warning: pyahocorasick not available, using slower pattern matching")
+
+try:
+    import numpy as np
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
 # Create Flask app
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'local-mortgage-analyzer-key'
@@ -53,218 +102,674 @@ app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB for local processi
 # Enable CORS for local development
 CORS(app)
 
-# Global variables for progress tracking
-progress_data = {}
+def ojsonify(data):
+    """jsonify, but through orjson's C serializer when it's installed"""
+    if ORJSON_AVAILABLE:
+        return Response(orjson.dumps(data), mimetype='application/json')
+    return jsonify(data)
+
+# Progress tracking: bounded and expiring so a long-running server can't
+# accumulate session entries forever; the lock guards against torn reads
+# when the server runs threaded
+progress_data = TTLCache(maxsize=1024, ttl=3600)
+_progress_lock = threading.Lock()
+
+# Live progress streams: one queue per SSE subscriber, so updates are pushed
+# to the client as they happen instead of being polled for
+_progress_queues = {}
+
+# Analysis results cached by file content hash, so re-uploading the same PDF
+# skips the whole extract+analyze pipeline. The in-process cache is LRU
+# bounded so a long-running server doesn't accumulate one full result
+# payload per distinct upload; evicted entries fall back to the disk copy,
+# which is aged out after a week.
+CACHE_DIR = Path(tempfile.gettempdir()) / 'mortgage_analyzer_cache'
+CACHE_DIR.mkdir(exist_ok=True)
+DISK_CACHE_TTL = 7 * 24 * 3600  # seconds
+_result_cache = LRUCache(maxsize=64)  # in-process digest -> result dict
+_result_cache_lock = threading.Lock()  # LRU reorders on read, so reads lock too
+
+def _content_digest(file_content):
+    """Hash file content with BLAKE2b (much faster than SHA on large files)"""
+    return hashlib.blake2b(file_content, digest_size=16).hexdigest()
+
+def _prune_disk_cache():
+    """Drop disk-cached results older than DISK_CACHE_TTL"""
+    cutoff = time.time() - DISK_CACHE_TTL
+    for cache_file in CACHE_DIR.glob('*.json'):
+        try:
+            if cache_file.stat().st_mtime < cutoff:
+                cache_file.unlink()
+        except OSError:
+            pass
+
+_prune_disk_cache()
+
+def _load_cached_result(digest):
+    """Return the cached analysis result for this digest, or None"""
+    with _result_cache_lock:
+        cached = _result_cache.get(digest)
+    if cached is not None:
+        return dict(cached)
+
+    cache_file = CACHE_DIR / f"{digest}.json"
+    if cache_file.exists():
+        try:
+            result = json.loads(cache_file.read_text())
+            with _result_cache_lock:
+                _result_cache[digest] = result
+            return dict(result)
+        except (OSError, ValueError) as e:
+            print(f"[LOCAL] Could not read result cache: {e}")
+    return None
+
+def _store_cached_result(digest, result):
+    """Persist an analysis result in memory and on disk"""
+    with _result_cache_lock:
+        _result_cache[digest] = result
+    try:
+        (CACHE_DIR / f"{digest}.json").write_text(json.dumps(result))
+    except OSError as e:
+        print(f"[LOCAL] Could not write result cache: {e}")
+    _prune_disk_cache()
 
 def update_progress(session_id, current, total, status):
     """Update progress for a session"""
-    progress_data[session_id] = {
+    entry = {
         'current': current,
         'total': total,
         'status': status,
         'percentage': int((current / total) * 100) if total > 0 else 0,
         'timestamp': datetime.now().isoformat()
     }
+    with _progress_lock:
+        progress_data[session_id] = entry
+        subscriber = _progress_queues.get(session_id)
+    if subscriber is not None:
+        subscriber.put(entry)
+
+@dataclass
+class TextCorpus:
+    """Extracted document text held as parallel arrays (one entry per line)
+
+    Struct-of-arrays layout: a plain list of line strings plus an
+    array('H') of page numbers uses a fraction of the memory of the old
+    one-dict-per-line representation on long documents.
+    """
+    texts: list = field(default_factory=list)
+    pages: array = field(default_factory=lambda: array('H'))
+    method: str = ""
+    pages_seen: set = field(default_factory=set)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def add_line(self, text, page):
+        self.texts.append(text)
+        self.pages.append(page)
+        self.pages_seen.add(page)
+
+    def add_lines(self, lines, page):
+        """Append a batch of lines from one page (cheaper than add_line per line)"""
+        if lines:
+            self.texts.extend(lines)
+            self.pages.extend([page] * len(lines))
+            self.pages_seen.add(page)
+
+    def page_count(self):
+        # Tracked incrementally as lines are added, so this never has to
+        # rescan the full corpus
+        return len(self.pages_seen)
+
+    def sort_by_page(self):
+        combined = sorted(zip(self.pages, self.texts), key=lambda entry: entry[0])
+        self.texts = [text for _, text in combined]
+        self.pages = array('H', (page for page, _ in combined))
+
+# OCR tuning: render at 100 DPI grayscale and binarize before Tesseract
+# (fewer pixels, and skips Tesseract's internal Otsu pass); pages that come
+# back nearly empty are retried once at the higher DPI
+OCR_DPI = 100
+OCR_RETRY_DPI = 200
+OCR_MIN_CLEAN_LINES = 5
+
+# LSTM-only engine with uniform-block page segmentation skips Tesseract's
+# auto orientation/script detection pass; tunable per deployment
+TESSERACT_CONFIG = '--oem 1 --psm 6'
+
+def _ocr_page_worker(image):
+    """Binarize and run Tesseract on a single page image (executed in a worker process)"""
+    image = ImageOps.autocontrast(image.convert('L'))
+    image = image.point(lambda p: 0 if p < 128 else 255, '1')
+    return pytesseract.image_to_string(image, lang='eng', config=TESSERACT_CONFIG)
+
+# Precompiled line filters: one C-level regex scan per line instead of
+# per-character Python predicates. The groups capture the stripped line;
+# the length floors match the old len(line) > 3 / > 5 checks.
+_GOOD_LINE = re.compile(r'^\s*(\S.{2,}\S)\s*$')
+_OCR_LINE = re.compile(r'^\s*(\S.{4,}\S)\s*$')
+_HAS_ALPHA = re.compile(r'[A-Za-z]').search
+
+def _clean_ocr_lines(text):
+    """Strip OCR output down to plausible text lines"""
+    return [m.group(1) for m in map(_OCR_LINE.match, text.split('\n'))
+            if m and _HAS_ALPHA(m.group(1))]
+
+def extract_text_from_pdf(pdf_path, session_id=None):
+    """Extract text from a PDF on disk using multiple methods, returning a TextCorpus"""
+    corpus = TextCorpus()
+    total_pages = 0
+
+    print(f"[LOCAL] Starting PDF text extraction from {os.path.getsize(pdf_path)} bytes")
+
+    # Speculatively render page images on a background thread while text
+    # extraction runs; poppler does the work in its own subprocess, so the
+    # two passes over the PDF overlap. If the text layer turns out to be
+    # complete the images are simply dropped.
+    render_executor = None
+    render_future = None
+    if OCR_AVAILABLE:
+        render_executor = ThreadPoolExecutor(max_workers=1)
+        render_future = render_executor.submit(convert_from_path, pdf_path, dpi=OCR_DPI,
+                                               grayscale=True, thread_count=os.cpu_count())
+
+    # Method 1a: pypdfium2 raw text extraction - much faster than pdfplumber
+    # because it skips per-page layout analysis
+    plumber_pages = None  # None means pdfplumber should do the whole document
+    if PYPDFIUM_AVAILABLE:
+        try:
+            print("[LOCAL] Attempting pypdfium2 extraction...")
+            pdf = pdfium.PdfDocument(pdf_path)
+            try:
+                total_pages = len(pdf)
+                print(f"[LOCAL] PDF has {total_pages} pages")
 
-def extract_text_from_pdf(file_content, session_id=None):
-    """Extract text from PDF using multiple methods"""
-    text_content = []
-    
-    print(f"[LOCAL] Starting PDF text extraction from {len(file_content)} bytes")
-    
-    # Method 1: Try pdfplumber first (fastest for text-based PDFs)
-    if PDFPLUMBER_AVAILABLE:
+                if session_id:
+                    update_progress(session_id, 0, total_pages, "extracting_text")
+
+                pages_with_lines = set()
+                for page_num, page in enumerate(pdf, 1):
+                    try:
+                        if session_id:
+                            update_progress(session_id, page_num, total_pages, "extracting_text")
+
+                        page_text = page.get_textpage().get_text_range()
+                        if page_text and page_text.strip():
+                            kept = [m.group(1) for m in map(_GOOD_LINE.match, page_text.splitlines()) if m]
+                            if kept:
+                                corpus.add_lines(kept, page_num)
+                                pages_with_lines.add(page_num)
+                            print(f"[LOCAL] Page {page_num}: extracted {len(kept)} lines via pypdfium2")
+                    except Exception as e:
+                        print(f"[LOCAL] pypdfium2 failed on page {page_num}: {e}")
+                        continue
+            finally:
+                pdf.close()
+
+            corpus.method = "pypdfium2"
+            print(f"[LOCAL] pypdfium2 extraction: {len(corpus)} text items")
+
+            # pdfplumber only needs to revisit pages pypdfium2 came up empty on
+            plumber_pages = [p for p in range(1, total_pages + 1) if p not in pages_with_lines]
+
+        except Exception as e:
+            print(f"[LOCAL] pypdfium2 extraction failed: {e}")
+
+    # Method 1b: pdfplumber, for the whole document when pypdfium2 is
+    # unavailable or for just the pages it couldn't read
+    if PDFPLUMBER_AVAILABLE and (plumber_pages is None or plumber_pages):
         try:
             print("[LOCAL] Attempting pdfplumber extraction...")
-            pdf_file = io.BytesIO(file_content)
-            
-            with pdfplumber.open(pdf_file) as pdf:
+            # mmap shares the kernel page cache with poppler instead of
+            # holding another full copy of the PDF in Python memory
+            with open(pdf_path, 'rb') as f, \
+                 mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as pdf_file, \
+                 pdfplumber.open(pdf_file) as pdf:
                 total_pages = len(pdf.pages)
-                print(f"[LOCAL] PDF has {total_pages} pages")
-                
+                page_nums = plumber_pages if plumber_pages is not None else range(1, total_pages + 1)
+
                 if session_id:
                     update_progress(session_id, 0, total_pages, "extracting_text")
-                
-                for page_num, page in enumerate(pdf.pages, 1):
+
+                added_before = len(corpus)
+                for page_num in page_nums:
                     try:
                         if session_id:
                             update_progress(session_id, page_num, total_pages, "extracting_text")
-                        
-                        page_text = page.extract_text()
+
+                        page_text = pdf.pages[page_num - 1].extract_text()
                         if page_text and page_text.strip():
-                            lines = [line.strip() for line in page_text.split('\n') if line.strip()]
-                            for line in lines:
-                                if len(line) > 3:  # Filter out very short lines
-                                    text_content.append({
-                                        "text": line,
-                                        "page": page_num,
-                                        "method": "pdfplumber"
-                                    })
-                            print(f"[LOCAL] Page {page_num}: extracted {len(lines)} lines via pdfplumber")
+                            kept = [m.group(1) for m in map(_GOOD_LINE.match, page_text.split('\n')) if m]
+                            corpus.add_lines(kept, page_num)
+                            print(f"[LOCAL] Page {page_num}: extracted {len(kept)} lines via pdfplumber")
                     except Exception as e:
                         print(f"[LOCAL] pdfplumber failed on page {page_num}: {e}")
                         continue
-            
-            print(f"[LOCAL] pdfplumber extraction: {len(text_content)} text items")
-            
+
+            if len(corpus) > added_before and corpus.method:
+                corpus.method += "+pdfplumber"
+                corpus.sort_by_page()
+            elif not corpus.method:
+                corpus.method = "pdfplumber"
+            print(f"[LOCAL] pdfplumber extraction: {len(corpus)} text items")
+
         except Exception as e:
             print(f"[LOCAL] pdfplumber extraction failed: {e}")
     
-    # Method 2: If little text extracted, try OCR
-    if len(text_content) < 10 and OCR_AVAILABLE:
-        print("[LOCAL] Low text yield, attempting OCR extraction...")
-        
-        try:
-            # Convert PDF to images
-            images = convert_from_bytes(file_content, dpi=150)
-            total_pages = len(images)
-            print(f"[LOCAL] Converted {total_pages} pages to images for OCR")
-            
-            if session_id:
-                update_progress(session_id, 0, total_pages, "ocr_processing")
-            
-            ocr_text_content = []
-            
-            for page_num, image in enumerate(images, 1):
-                try:
-                    if session_id:
-                        update_progress(session_id, page_num, total_pages, f"ocr_page_{page_num}")
-                    
-                    print(f"[LOCAL] Running OCR on page {page_num}/{total_pages}...")
-                    
-                    # Run OCR
-                    text = pytesseract.image_to_string(image, lang='eng')
-                    
-                    if text.strip():
-                        lines = [line.strip() for line in text.split('\n') if line.strip()]
-                        
-                        # Filter OCR noise
-                        clean_lines = []
-                        for line in lines:
-                            if len(line) > 5 and any(c.isalpha() for c in line):
-                                clean_lines.append(line)
-                        
-                        for line in clean_lines:
-                            ocr_text_content.append({
-                                "text": line,
-                                "page": page_num,
-                                "method": "OCR"
-                            })
-                        
-                        if clean_lines:
-                            print(f"[LOCAL] Page {page_num}: extracted {len(clean_lines)} clean lines via OCR")
-                
-                except Exception as e:
-                    print(f"[LOCAL] OCR failed on page {page_num}: {e}")
-                    continue
-            
-            if ocr_text_content:
-                print(f"[LOCAL] OCR extraction successful: {len(ocr_text_content)} text items")
-                text_content = ocr_text_content  # Use OCR results
-            
-        except Exception as e:
-            print(f"[LOCAL] OCR extraction failed: {e}")
-            traceback.print_exc()
-    
-    print(f"[LOCAL] Final extraction: {len(text_content)} text items from {len(set(item['page'] for item in text_content)) if text_content else 0} pages")
-    
-    return text_content
+    # Method 2: Per-page OCR fallback - only OCR pages pdfplumber couldn't read,
+    # so one scanned page in a text PDF no longer forces whole-document OCR
+    if OCR_AVAILABLE:
+        lines_per_page = {}
+        for page in corpus.pages:
+            lines_per_page[page] = lines_per_page.get(page, 0) + 1
+
+        if total_pages > 0:
+            ocr_needed_pages = [p for p in range(1, total_pages + 1)
+                                if lines_per_page.get(p, 0) < 3]
+        elif len(corpus) < 10:
+            ocr_needed_pages = None  # page count unknown, OCR the whole document
+        else:
+            ocr_needed_pages = []
+
+        if ocr_needed_pages is None or ocr_needed_pages:
+            try:
+                # The speculative render has been running since extraction
+                # started; keep only the pages that actually need OCR
+                images = render_future.result()
+                if ocr_needed_pages is None:
+                    images_by_page = {p: img for p, img in enumerate(images, 1)}
+                else:
+                    print(f"[LOCAL] {len(ocr_needed_pages)} of {total_pages} pages need OCR: {ocr_needed_pages}")
+                    images_by_page = {p: images[p - 1] for p in ocr_needed_pages
+                                      if p - 1 < len(images)}
+
+                ocr_total = len(images_by_page)
+                print(f"[LOCAL] Converted {ocr_total} pages to images for OCR")
+
+                if session_id:
+                    update_progress(session_id, 0, ocr_total, "ocr_processing")
+
+                ocr_texts = []
+                ocr_pages = array('H')
+
+                # OCR pages concurrently - each Tesseract run is an independent
+                # subprocess, so this scales near-linearly up to cpu_count
+                page_texts = {}
+                max_workers = min(os.cpu_count() or 1, ocr_total)
+                print(f"[LOCAL] Running OCR with {max_workers} parallel workers...")
+
+                with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                    future_to_page = {
+                        executor.submit(_ocr_page_worker, image): page_num
+                        for page_num, image in images_by_page.items()
+                    }
 
-def analyze_mortgage_sections(text_content):
+                    completed = 0
+                    for future in as_completed(future_to_page):
+                        page_num = future_to_page[future]
+                        completed += 1
+
+                        if session_id:
+                            update_progress(session_id, completed, ocr_total, f"ocr_page_{page_num}")
+
+                        try:
+                            page_texts[page_num] = future.result()
+                        except Exception as e:
+                            print(f"[LOCAL] OCR failed on page {page_num}: {e}")
+                            continue
+
+                # Filter OCR noise per page
+                clean_by_page = {p: _clean_ocr_lines(text) for p, text in page_texts.items()}
+
+                # Retry nearly-empty pages once at higher DPI in case the
+                # low-resolution render lost small print
+                retry_pages = [p for p, lines in sorted(clean_by_page.items())
+                               if len(lines) < OCR_MIN_CLEAN_LINES]
+                for p in retry_pages:
+                    try:
+                        print(f"[LOCAL] Page {p}: weak OCR result, retrying at {OCR_RETRY_DPI} DPI...")
+                        page_images = convert_from_path(pdf_path, dpi=OCR_RETRY_DPI, grayscale=True,
+                                                         first_page=p, last_page=p)
+                        if page_images:
+                            retry_lines = _clean_ocr_lines(_ocr_page_worker(page_images[0]))
+                            if len(retry_lines) > len(clean_by_page[p]):
+                                clean_by_page[p] = retry_lines
+                    except Exception as e:
+                        print(f"[LOCAL] OCR retry failed on page {p}: {e}")
+
+                # Reassemble results in page order
+                for page_num in sorted(clean_by_page):
+                    clean_lines = clean_by_page[page_num]
+
+                    ocr_texts.extend(clean_lines)
+                    ocr_pages.extend([page_num] * len(clean_lines))
+
+                    if clean_lines:
+                        print(f"[LOCAL] Page {page_num}: extracted {len(clean_lines)} clean lines via OCR")
+
+                if ocr_texts:
+                    print(f"[LOCAL] OCR extraction successful: {len(ocr_texts)} text items")
+                    # Merge OCR results with the extracted text rather than replacing it
+                    corpus.texts.extend(ocr_texts)
+                    corpus.pages.extend(ocr_pages)
+                    corpus.pages_seen.update(ocr_pages)
+                    corpus.sort_by_page()
+                    corpus.method = corpus.method + "+OCR" if corpus.method else "OCR"
+
+            except Exception as e:
+                print(f"[LOCAL] OCR extraction failed: {e}")
+                traceback.print_exc()
+        else:
+            # The text layer covered every page - drop the speculative render
+            render_future.cancel()
+
+    if render_executor is not None:
+        render_executor.shutdown(wait=False, cancel_futures=True)
+
+    print(f"[LOCAL] Final extraction: {len(corpus)} text items from {corpus.page_count()} pages")
+
+    return corpus
+
+# Enhanced rules based on real mortgage documents
+SECTION_RULES = [
+    # Core mortgage documents (highest priority)
+    {"patterns": ["MORTGAGE", "DEED OF TRUST", "SECURITY INSTRUMENT"], "label": "Mortgage", "priority": 10},
+    {"patterns": ["PROMISSORY NOTE", "NOTE"], "label": "Promissory Note", "priority": 10},
+
+    # Closing documents
+    {"patterns": ["LENDERS CLOSING INSTRUCTIONS", "CLOSING INSTRUCTIONS GUARANTY", "LENDER'S CLOSING INSTRUCTIONS"], "label": "Lenders Closing Instructions Guaranty", "priority": 9},
+    {"patterns": ["SETTLEMENT STATEMENT", "HUD-1", "CLOSING DISCLOSURE"], "label": "Settlement Statement", "priority": 9},
+
+    # Legal documents
+    {"patterns": ["STATEMENT OF ANTI COERCION", "ANTI COERCION", "ANTI-COERCION FLORIDA"], "label": "Statement of Anti Coercion Florida", "priority": 8},
+    {"patterns": ["CORRECTION AGREEMENT", "LIMITED POWER OF ATTORNEY", "POWER OF ATTORNEY"], "label": "Correction Agreement and Limited Power of Attorney", "priority": 8},
+    {"patterns": ["ALL PURPOSE ACKNOWLEDGMENT", "ACKNOWLEDGMENT", "NOTARY ACKNOWLEDGMENT"], "label": "All Purpose Acknowledgment", "priority": 8},
+
+    # Insurance and hazard documents
+    {"patterns": ["FLOOD HAZARD DETERMINATION", "FLOOD DETERMINATION", "FEMA FLOOD"], "label": "Flood Hazard Determination", "priority": 7},
+    {"patterns": ["INSURANCE POLICY", "HOMEOWNER'S INSURANCE", "HAZARD INSURANCE"], "label": "Insurance Policy", "priority": 7},
+
+    # Payment and tax documents
+    {"patterns": ["AUTOMATIC PAYMENTS AUTHORIZATION", "AUTOMATIC PAYMENT", "ACH AUTHORIZATION"], "label": "Automatic Payments Authorization", "priority": 7},
+    {"patterns": ["TAX RECORD INFORMATION", "TAX RECORDS", "PROPERTY TAX"], "label": "Tax Record Information", "priority": 7},
+
+    # Title documents
+    {"patterns": ["TITLE POLICY", "TITLE INSURANCE", "OWNER'S POLICY"], "label": "Title Policy", "priority": 6},
+    {"patterns": ["DEED", "WARRANTY DEED", "QUITCLAIM DEED"], "label": "Deed", "priority": 6},
+
+    # Other documents
+    {"patterns": ["UCC FILING", "UCC-1", "FINANCING STATEMENT"], "label": "UCC Filing", "priority": 5},
+    {"patterns": ["SIGNATURE PAGE", "SIGNATURES", "BORROWER SIGNATURE"], "label": "Signature Page", "priority": 5},
+    {"patterns": ["AFFIDAVIT", "SWORN STATEMENT"], "label": "Affidavit", "priority": 5},
+]
+
+def _build_section_automaton():
+    """Compile all section patterns into a single Aho-Corasick automaton"""
+    automaton = ahocorasick.Automaton()
+    for rule in SECTION_RULES:
+        for pattern in rule["patterns"]:
+            automaton.add_word(pattern, (rule["label"], rule["priority"], pattern, rule["patterns"]))
+    automaton.make_automaton()
+    return automaton
+
+SECTION_AUTOMATON = _build_section_automaton() if AHOCORASICK_AVAILABLE else None
+
+def _build_section_patterns():
+    """Flatten all section patterns for the substring fallback matcher
+
+    Ordered longest-first so, when several patterns hit the same line, the
+    more specific one is reported before any of its substrings.
+    """
+    flat = [(pattern, (rule["label"], rule["priority"], pattern, rule["patterns"]))
+            for rule in SECTION_RULES for pattern in rule["patterns"]]
+    flat.sort(key=lambda entry: -len(entry[0]))
+    return flat
+
+_SECTION_PATTERNS = _build_section_patterns()
+
+def _match_section_patterns(text):
+    """Yield (label, priority, pattern, patterns) for every pattern found in text"""
+    if SECTION_AUTOMATON is not None:
+        # Single linear scan over the line instead of one pass per pattern
+        for _end_idx, match in SECTION_AUTOMATON.iter(text):
+            yield match
+    else:
+        # One C-level substring scan per pattern. A single alternation regex
+        # is not equivalent here: finditer consumes matched text, so a line
+        # like "TITLE INSURANCE POLICY" would report Title Policy but drop
+        # the overlapping Insurance Policy hit the automaton finds. Hits are
+        # replayed in end-position order so order-sensitive tie-breaks
+        # downstream behave the same on both paths.
+        hits = []
+        for pattern, match in _SECTION_PATTERNS:
+            start = text.find(pattern)
+            while start != -1:
+                hits.append((start + len(pattern), match))
+                start = text.find(pattern, start + 1)
+        hits.sort(key=lambda hit: hit[0])
+        for _end_idx, match in hits:
+            yield match
+
+def _line_confidence(text, pattern, patterns):
+    """Confidence of a pattern hit on an uppercased line"""
+    if text.strip() == pattern:
+        return "high"
+    if len(text.split()) <= 10:
+        return "high"
+    if len([p for p in patterns if p in text]) > 1:
+        return "high"
+    return "medium"
+
+# Numeric scoring path for very large corpora: with hundreds of thousands of
+# pattern hits the per-hit dict bookkeeping dominates, so the best-hit
+# reduction runs as a compiled numba loop over flat arrays instead
+SECTION_JIT_THRESHOLD = 10_000
+SECTION_LABELS = [rule["label"] for rule in SECTION_RULES]
+_LABEL_TO_ID = {label: i for i, label in enumerate(SECTION_LABELS)}
+
+if NUMBA_AVAILABLE:
+    @njit(nogil=True, cache=True)
+    def _best_hit_per_label(label_ids, conf_ranks, n_labels):
+        """Index of the winning hit per label (first high, else latest best)"""
+        best = np.full(n_labels, -1, dtype=np.int64)
+        best_rank = np.zeros(n_labels, dtype=np.int64)
+        for i in range(label_ids.shape[0]):
+            label = label_ids[i]
+            rank = conf_ranks[i]
+            if best[label] == -1 or rank > best_rank[label] or \
+                    (rank == best_rank[label] and best_rank[label] < 3):
+                best[label] = i
+                best_rank[label] = rank
+        return best
+
+def _analyze_sections_arrays(corpus):
+    """Array-based variant of analyze_mortgage_sections for huge corpora"""
+    rank_map = {"high": 3, "medium": 2, "low": 1}
+    label_ids = []
+    conf_ranks = []
+    hits = []  # (line_idx, label, priority, pattern, confidence)
+
+    for line_idx, raw_text in enumerate(corpus.texts):
+        text = raw_text.upper()
+        for label, priority, pattern, patterns in _match_section_patterns(text):
+            confidence = _line_confidence(text, pattern, patterns)
+            label_ids.append(_LABEL_TO_ID[label])
+            conf_ranks.append(rank_map[confidence])
+            hits.append((line_idx, label, priority, pattern, confidence))
+
+    if not hits:
+        return []
+
+    best = _best_hit_per_label(np.asarray(label_ids, dtype=np.int64),
+                               np.asarray(conf_ranks, dtype=np.int64),
+                               len(SECTION_LABELS))
+
+    sections = []
+    for hit_idx in best:
+        if hit_idx < 0:
+            continue
+        line_idx, label, priority, pattern, confidence = hits[hit_idx]
+        sections.append({
+            "section_type": label,
+            "page": corpus.pages[line_idx],
+            "confidence": confidence,
+            "text_snippet": corpus.texts[line_idx][:100],
+            "priority": priority,
+            "pattern_matched": pattern
+        })
+
+    sections.sort(key=lambda x: (-x["priority"], x["page"], x["section_type"]))
+    print(f"[LOCAL] Analysis complete: {len(sections)} sections identified")
+    return sections
+
+def analyze_mortgage_sections(corpus):
     """Analyze mortgage document sections using enhanced pattern matching"""
-    
-    # Enhanced rules based on real mortgage documents
-    section_rules = [
-        # Core mortgage documents (highest priority)
-        {"patterns": ["MORTGAGE", "DEED OF TRUST", "SECURITY INSTRUMENT"], "label": "Mortgage", "priority": 10},
-        {"patterns": ["PROMISSORY NOTE", "NOTE"], "label": "Promissory Note", "priority": 10},
-        
-        # Closing documents
-        {"patterns": ["LENDERS CLOSING INSTRUCTIONS", "CLOSING INSTRUCTIONS GUARANTY", "LENDER'S CLOSING INSTRUCTIONS"], "label": "Lenders Closing Instructions Guaranty", "priority": 9},
-        {"patterns": ["SETTLEMENT STATEMENT", "HUD-1", "CLOSING DISCLOSURE"], "label": "Settlement Statement", "priority": 9},
-        
-        # Legal documents
-        {"patterns": ["STATEMENT OF ANTI COERCION", "ANTI COERCION", "ANTI-COERCION FLORIDA"], "label": "Statement of Anti Coercion Florida", "priority": 8},
-        {"patterns": ["CORRECTION AGREEMENT", "LIMITED POWER OF ATTORNEY", "POWER OF ATTORNEY"], "label": "Correction Agreement and Limited Power of Attorney", "priority": 8},
-        {"patterns": ["ALL PURPOSE ACKNOWLEDGMENT", "ACKNOWLEDGMENT", "NOTARY ACKNOWLEDGMENT"], "label": "All Purpose Acknowledgment", "priority": 8},
-        
-        # Insurance and hazard documents
-        {"patterns": ["FLOOD HAZARD DETERMINATION", "FLOOD DETERMINATION", "FEMA FLOOD"], "label": "Flood Hazard Determination", "priority": 7},
-        {"patterns": ["INSURANCE POLICY", "HOMEOWNER'S INSURANCE", "HAZARD INSURANCE"], "label": "Insurance Policy", "priority": 7},
-        
-        # Payment and tax documents
-        {"patterns": ["AUTOMATIC PAYMENTS AUTHORIZATION", "AUTOMATIC PAYMENT", "ACH AUTHORIZATION"], "label": "Automatic Payments Authorization", "priority": 7},
-        {"patterns": ["TAX RECORD INFORMATION", "TAX RECORDS", "PROPERTY TAX"], "label": "Tax Record Information", "priority": 7},
-        
-        # Title documents
-        {"patterns": ["TITLE POLICY", "TITLE INSURANCE", "OWNER'S POLICY"], "label": "Title Policy", "priority": 6},
-        {"patterns": ["DEED", "WARRANTY DEED", "QUITCLAIM DEED"], "label": "Deed", "priority": 6},
-        
-        # Other documents
-        {"patterns": ["UCC FILING", "UCC-1", "FINANCING STATEMENT"], "label": "UCC Filing", "priority": 5},
-        {"patterns": ["SIGNATURE PAGE", "SIGNATURES", "BORROWER SIGNATURE"], "label": "Signature Page", "priority": 5},
-        {"patterns": ["AFFIDAVIT", "SWORN STATEMENT"], "label": "Affidavit", "priority": 5},
-    ]
-    
+
+    # Huge corpora take the compiled scoring path; small ones pay back
+    # faster in plain Python
+    if NUMBA_AVAILABLE and len(corpus) > SECTION_JIT_THRESHOLD:
+        return _analyze_sections_arrays(corpus)
+
     found_sections = {}
-    
-    # Analyze each text item
-    for item in text_content:
-        text = item["text"].upper()
-        page = item["page"]
-        
-        for rule in section_rules:
-            patterns = rule["patterns"]
-            label = rule["label"]
-            priority = rule["priority"]
-            
-            for pattern in patterns:
-                if pattern in text:
-                    # Determine confidence
-                    confidence = "medium"
-                    if text.strip() == pattern:
-                        confidence = "high"
-                    elif pattern in text and len(text.split()) <= 10:
-                        confidence = "high"
-                    elif len([p for p in patterns if p in text]) > 1:
-                        confidence = "high"
-                    
-                    # Keep best match for each section type
-                    if label not in found_sections:
-                        found_sections[label] = {
-                            "section_type": label,
-                            "page": page,
-                            "confidence": confidence,
-                            "text_snippet": item["text"][:100],
-                            "priority": priority,
-                            "pattern_matched": pattern
-                        }
-                        print(f"[LOCAL] Found section: {label} on page {page} (pattern: {pattern})")
-                    else:
-                        # Update if better match
-                        existing = found_sections[label]
-                        confidence_rank = {"high": 3, "medium": 2, "low": 1}
-                        if (confidence_rank.get(confidence, 0) > confidence_rank.get(existing["confidence"], 0) or
-                            (confidence == existing["confidence"] and priority >= existing["priority"])):
-                            found_sections[label].update({
-                                "page": page,
-                                "confidence": confidence,
-                                "text_snippet": item["text"][:100],
-                                "pattern_matched": pattern
-                            })
+    confidence_rank = {"high": 3, "medium": 2, "low": 1}
+
+    # Labels already matched at high confidence can never be upgraded, so
+    # skip them for the rest of the document
+    high_conf_locked = set()
+
+    # Analyze each text line; zip over the parallel arrays avoids an index
+    # lookup per line
+    for raw_text, page in zip(corpus.texts, corpus.pages):
+        text = raw_text.upper()
+
+        for label, priority, pattern, patterns in _match_section_patterns(text):
+            if label in high_conf_locked:
+                continue
+
+            confidence = _line_confidence(text, pattern, patterns)
+
+            # Keep best match for each section type
+            if label not in found_sections:
+                found_sections[label] = {
+                    "section_type": label,
+                    "page": page,
+                    "confidence": confidence,
+                    "text_snippet": raw_text[:100],
+                    "priority": priority,
+                    "pattern_matched": pattern
+                }
+                print(f"[LOCAL] Found section: {label} on page {page} (pattern: {pattern})")
+            else:
+                # Update if better match
+                existing = found_sections[label]
+                if (confidence_rank.get(confidence, 0) > confidence_rank.get(existing["confidence"], 0) or
+                    (confidence == existing["confidence"] and priority >= existing["priority"])):
+                    found_sections[label].update({
+                        "page": page,
+                        "confidence": confidence,
+                        "text_snippet": raw_text[:100],
+                        "pattern_matched": pattern
+                    })
+
+            if confidence == "high":
+                high_conf_locked.add(label)
+                # A line that exactly hits a top-priority section is almost
+                # never also the header of another one - stop scanning it
+                if priority >= 9:
                     break
-    
+
     # Sort by priority and page
-    sections = sorted(list(found_sections.values()), 
+    sections = sorted(list(found_sections.values()),
                      key=lambda x: (-x["priority"], x["page"], x["section_type"]))
-    
+
     print(f"[LOCAL] Analysis complete: {len(sections)} sections identified")
     return sections
 
+# The UI is one self-contained page, so load it into memory once at import
+# and serve it with a content-hash ETag; repeat visits get a 304 and never
+# touch the filesystem
+INDEX_BYTES = (Path(app.static_folder) / 'index.html').read_bytes()
+INDEX_ETAG = '"%s"' % hashlib.md5(INDEX_BYTES).hexdigest()
+
+# Compress the page once at startup at maximum settings; per-request
+# compression would pay the CPU cost on every cold visit
+INDEX_GZIP = gzip.compress(INDEX_BYTES, compresslevel=9)
+INDEX_BROTLI = brotli.compress(INDEX_BYTES, quality=11) if BROTLI_AVAILABLE else None
+
 @app.route('/')
 def index():
     """Serve the main application page"""
-    return render_template_string(HTML_TEMPLATE)
+    if request.headers.get('If-None-Match') == INDEX_ETAG:
+        response = Response(status=304)
+    else:
+        accept_encoding = request.headers.get('Accept-Encoding', '')
+        if INDEX_BROTLI is not None and 'br' in accept_encoding:
+            response = Response(INDEX_BROTLI, mimetype='text/html')
+            response.headers['Content-Encoding'] = 'br'
+        elif 'gzip' in accept_encoding:
+            response = Response(INDEX_GZIP, mimetype='text/html')
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = Response(INDEX_BYTES, mimetype='text/html')
+        # The page URL is unversioned and the JS must stay in lockstep with
+        # the API, so browsers must revalidate every visit; the ETag makes
+        # that a cheap 304
+        response.headers['Cache-Control'] = 'no-cache'
+    response.headers['ETag'] = INDEX_ETAG
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+# Background analysis jobs: uploads return a session id immediately and the
+# client collects the result when the job completes. Worker threads share
+# the progress store with the request threads; the OCR stage already fans
+# out to its own process pool for the CPU-heavy work.
+_JOB_POOL = ThreadPoolExecutor(max_workers=2)
+_jobs = TTLCache(maxsize=256, ttl=3600)
+_jobs_lock = threading.Lock()
+
+def _run_pipeline(pdf_path, digest, session_id):
+    """Run the full extract+analyze pipeline for a background job"""
+    try:
+        corpus = extract_text_from_pdf(pdf_path, session_id)
+
+        if not len(corpus):
+            return {'error': 'Could not extract text from PDF. The file may be corrupted or contain only images without readable text.'}
+
+        update_progress(session_id, 1, 1, "analyzing")
+        sections = analyze_mortgage_sections(corpus)
+
+        # Pre-pad the TOC display strings once per analysis so the client
+        # doesn't reformat them on every TOC export
+        for s in sections:
+            s['page_str'] = f'Page {s["page"]:>6}'
+            s['type_padded'] = s['section_type'].ljust(40, '.')
+
+        print(f"[LOCAL] Analysis complete: {len(sections)} sections identified")
+
+        result = {
+            'sections': sections,
+            'total_pages': corpus.page_count(),
+            'total_text_items': len(corpus),
+            'processing_method': 'local',
+            'ocr_available': OCR_AVAILABLE,
+            'pdfplumber_available': PDFPLUMBER_AVAILABLE
+        }
+        _store_cached_result(digest, result)
+
+        return dict(result, session_id=session_id)
+    except Exception as e:
+        error_msg = f"Document processing error: {str(e)}"
+        print(f"[LOCAL ERROR] {error_msg}")
+        print(f"[LOCAL ERROR] Full traceback: {traceback.format_exc()}")
+        return {'error': error_msg}
+    finally:
+        # Terminal progress event even on failure, so stream subscribers
+        # know to fetch the result
+        update_progress(session_id, 1, 1, "completed")
+        try:
+            os.unlink(pdf_path)
+        except OSError:
+            pass
 
 @app.route('/api/analyze', methods=['POST'])
 def analyze_document():
@@ -272,74 +777,130 @@ def analyze_document():
     try:
         print("[LOCAL] Starting document analysis...")
         
-        # Generate session ID
-        session_id = str(uuid.uuid4())
+        # Use the client-supplied session ID (so it can already be
+        # subscribed to the progress stream) or generate one
+        session_id = request.form.get('session_id') or str(uuid.uuid4())
         
         if 'file' not in request.files:
-            return jsonify({'error': 'No file uploaded'}), 400
+            return ojsonify({'error': 'No file uploaded'}), 400
         
         file = request.files['file']
         if file.filename == '':
-            return jsonify({'error': 'No file selected'}), 400
+            return ojsonify({'error': 'No file selected'}), 400
         
         if not file.filename.lower().endswith('.pdf'):
-            return jsonify({'error': 'Only PDF files are supported'}), 400
-        
-        # Read file content
-        file_content = file.read()
-        file_size = len(file_content)
-        
-        print(f"[LOCAL] Processing file: {file.filename} ({file_size} bytes)")
-        
-        if file_size == 0:
-            return jsonify({'error': 'File is empty'}), 400
-        
-        # Initialize progress
-        update_progress(session_id, 0, 1, "starting")
-        
-        # Extract text from PDF
-        text_content = extract_text_from_pdf(file_content, session_id)
+            return ojsonify({'error': 'Only PDF files are supported'}), 400
         
-        if not text_content:
-            return jsonify({'error': 'Could not extract text from PDF. The file may be corrupted or contain only images without readable text.'}), 400
-        
-        # Analyze sections
-        update_progress(session_id, 1, 1, "analyzing")
-        sections = analyze_mortgage_sections(text_content)
-        
-        # Complete
-        update_progress(session_id, 1, 1, "completed")
-        
-        print(f"[LOCAL] Analysis complete: {len(sections)} sections identified")
-        
-        return jsonify({
-            'session_id': session_id,
-            'sections': sections,
-            'total_pages': len(set(item['page'] for item in text_content)),
-            'total_text_items': len(text_content),
-            'processing_method': 'local',
-            'ocr_available': OCR_AVAILABLE,
-            'pdfplumber_available': PDFPLUMBER_AVAILABLE
-        })
+        # Stream the upload to a temp file once instead of buffering the
+        # whole PDF in Python memory; pdfplumber reads it via mmap and
+        # poppler gets the path, so they share the kernel page cache
+        with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tf:
+            file.save(tf)
+            pdf_path = tf.name
+
+        submitted = False
+        try:
+            file_size = os.path.getsize(pdf_path)
+
+            print(f"[LOCAL] Processing file: {file.filename} ({file_size} bytes)")
+
+            if file_size == 0:
+                return ojsonify({'error': 'File is empty'}), 400
+
+            # Return cached results immediately for identical content
+            with open(pdf_path, 'rb') as f, \
+                 mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                digest = _content_digest(mm)
+
+            cached = _load_cached_result(digest)
+            if cached is not None:
+                print(f"[LOCAL] Cache hit for {file.filename} (digest {digest})")
+                update_progress(session_id, 1, 1, "completed")
+                cached['session_id'] = session_id
+                return ojsonify(cached)
+
+            # Hand the pipeline to a background worker and return right away;
+            # the client follows progress on the event stream and collects the
+            # result from /api/result when it completes
+            update_progress(session_id, 0, 1, "starting")
+            job = _JOB_POOL.submit(_run_pipeline, pdf_path, digest, session_id)
+            submitted = True
+            with _jobs_lock:
+                _jobs[session_id] = job
+
+            return ojsonify({'session_id': session_id, 'status': 'pending'}), 202
+        finally:
+            if not submitted:
+                try:
+                    os.unlink(pdf_path)
+                except OSError:
+                    pass
         
     except Exception as e:
         error_msg = f"Document processing error: {str(e)}"
         print(f"[LOCAL ERROR] {error_msg}")
         print(f"[LOCAL ERROR] Full traceback: {traceback.format_exc()}")
-        return jsonify({'error': error_msg}), 500
+        return ojsonify({'error': error_msg}), 500
+
+@app.route('/api/result/<session_id>')
+def get_result(session_id):
+    """Fetch the result of a background analysis job"""
+    with _jobs_lock:
+        job = _jobs.get(session_id)
+
+    if job is None:
+        return ojsonify({'error': 'Session not found'}), 404
+    if not job.done():
+        return ojsonify({'session_id': session_id, 'status': 'pending'}), 202
+
+    result = job.result()
+    if 'error' in result:
+        return ojsonify(result), 500
+    return ojsonify(result)
 
 @app.route('/api/progress/<session_id>')
 def get_progress(session_id):
     """Get processing progress for a session"""
-    if session_id in progress_data:
-        return jsonify(progress_data[session_id])
+    with _progress_lock:
+        progress = progress_data.get(session_id)
+
+    if progress is not None:
+        return ojsonify(progress)
     else:
-        return jsonify({'error': 'Session not found'}), 404
+        return ojsonify({'error': 'Session not found'}), 404
+
+@app.route('/api/stream/<session_id>')
+def stream_progress(session_id):
+    """Stream progress updates for a session as Server-Sent Events"""
+    def generate():
+        subscriber = queue.Queue()
+        with _progress_lock:
+            _progress_queues[session_id] = subscriber
+            snapshot = progress_data.get(session_id)
+        try:
+            if snapshot is not None:
+                yield f"data: {json.dumps(snapshot)}\n\n"
+                if snapshot.get('status') == 'completed':
+                    return
+            while True:
+                try:
+                    entry = subscriber.get(timeout=30)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"data: {json.dumps(entry)}\n\n"
+                if entry.get('status') == 'completed':
+                    return
+        finally:
+            with _progress_lock:
+                _progress_queues.pop(session_id, None)
+
+    return Response(generate(), mimetype='text/event-stream')
 
 @app.route('/api/health')
 def health_check():
     """Health check endpoint"""
-    return jsonify({
+    return ojsonify({
         'status': 'healthy',
         'version': 'local-1.0',
         'ocr_available': OCR_AVAILABLE,
@@ -351,519 +912,6 @@ def health_check():
         }
     })
 
-# HTML Template for the application
-HTML_TEMPLATE = '''
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Mortgage Package Analyzer - Local</title>
-    <style>
-        body { 
-            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
-            margin: 0; 
-            padding: 20px; 
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh;
-        }
-        .container { 
-            max-width: 1000px; 
-            margin: 0 auto; 
-            background: white; 
-            border-radius: 12px; 
-            box-shadow: 0 10px 30px rgba(0,0,0,0.2); 
-            overflow: hidden;
-        }
-        .header { 
-            background: linear-gradient(135deg, #2c3e50 0%, #34495e 100%); 
-            color: white; 
-            padding: 40px; 
-            text-align: center; 
-        }
-        .header h1 { margin: 0; font-size: 2.5em; font-weight: 300; }
-        .header p { margin: 15px 0 0 0; opacity: 0.9; font-size: 1.1em; }
-        .status-bar {
-            background: #f8f9fa;
-            padding: 15px 30px;
-            border-bottom: 1px solid #e9ecef;
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            font-size: 14px;
-        }
-        .status-indicator {
-            display: flex;
-            align-items: center;
-            gap: 8px;
-        }
-        .status-dot {
-            width: 8px;
-            height: 8px;
-            border-radius: 50%;
-            background: #28a745;
-        }
-        .section { 
-            margin: 30px; 
-            padding: 25px; 
-            border: 1px solid #e0e0e0; 
-            border-radius: 10px; 
-            background: #fafafa;
-        }
-        .upload-area {
-            border: 3px dashed #ccc;
-            border-radius: 12px;
-            padding: 60px;
-            text-align: center;
-            background: white;
-            cursor: pointer;
-            transition: all 0.3s ease;
-            position: relative;
-        }
-        .upload-area:hover {
-            border-color: #667eea;
-            background: #f8f9ff;
-            transform: translateY(-2px);
-        }
-        .upload-area.dragover {
-            border-color: #667eea;
-            background: #f0f8ff;
-        }
-        .file-input { display: none; }
-        .btn {
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: white;
-            border: none;
-            padding: 12px 24px;
-            border-radius: 8px;
-            cursor: pointer;
-            margin: 8px;
-            font-size: 14px;
-            font-weight: 500;
-            transition: all 0.3s ease;
-        }
-        .btn:hover { 
-            transform: translateY(-2px);
-            box-shadow: 0 5px 15px rgba(102, 126, 234, 0.4);
-        }
-        .btn:disabled { 
-            background: #ccc; 
-            cursor: not-allowed; 
-            transform: none;
-            box-shadow: none;
-        }
-        .progress-container {
-            margin: 20px 0;
-            display: none;
-        }
-        .progress-bar {
-            width: 100%;
-            height: 20px;
-            background: #e9ecef;
-            border-radius: 10px;
-            overflow: hidden;
-        }
-        .progress-fill {
-            height: 100%;
-            background: linear-gradient(90deg, #28a745, #20c997);
-            width: 0%;
-            transition: width 0.3s ease;
-        }
-        .progress-text {
-            text-align: center;
-            margin-top: 10px;
-            font-size: 14px;
-            color: #666;
-        }
-        .results { 
-            margin-top: 30px; 
-            display: none; 
-        }
-        .section-grid {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(300px, 1fr));
-            gap: 15px;
-            margin: 20px 0;
-        }
-        .section-card {
-            background: white;
-            border: 1px solid #e0e0e0;
-            border-radius: 8px;
-            padding: 20px;
-            transition: all 0.3s ease;
-        }
-        .section-card:hover {
-            transform: translateY(-2px);
-            box-shadow: 0 5px 15px rgba(0,0,0,0.1);
-        }
-        .confidence-high { border-left: 4px solid #28a745; }
-        .confidence-medium { border-left: 4px solid #ffc107; }
-        .confidence-low { border-left: 4px solid #dc3545; }
-        .section-title {
-            font-weight: 600;
-            font-size: 16px;
-            margin-bottom: 8px;
-            color: #2c3e50;
-        }
-        .section-meta {
-            font-size: 12px;
-            color: #666;
-            margin-bottom: 10px;
-        }
-        .section-snippet {
-            font-size: 12px;
-            font-style: italic;
-            color: #888;
-            background: #f8f9fa;
-            padding: 8px;
-            border-radius: 4px;
-            margin-top: 10px;
-        }
-        .controls {
-            display: flex;
-            gap: 10px;
-            margin: 20px 0;
-            flex-wrap: wrap;
-        }
-        .error { 
-            background: #f8d7da; 
-            color: #721c24; 
-            padding: 15px; 
-            border-radius: 8px; 
-            margin: 15px 0;
-            border: 1px solid #f5c6cb;
-        }
-        .success { 
-            background: #d4edda; 
-            color: #155724; 
-            padding: 15px; 
-            border-radius: 8px; 
-            margin: 15px 0;
-            border: 1px solid #c3e6cb;
-        }
-        .local-badge {
-            position: fixed;
-            top: 20px;
-            right: 20px;
-            background: rgba(40, 167, 69, 0.9);
-            color: white;
-            padding: 8px 16px;
-            border-radius: 20px;
-            font-size: 12px;
-            font-weight: 500;
-            backdrop-filter: blur(10px);
-        }
-    </style>
-</head>
-<body>
-    <div class="local-badge">🏠 Local Server</div>
-    
-    <div class="container">
-        <div class="header">
-            <h1>🏠 Mortgage Package Analyzer</h1>
-            <p>Local Web Server - Full OCR Capabilities - Complete Privacy</p>
-        </div>
-
-        <div class="status-bar">
-            <div class="status-indicator">
-                <div class="status-dot"></div>
-                <span>Local Server Running</span>
-            </div>
-            <div id="dependencyStatus">
-                <span>Loading dependencies...</span>
-            </div>
-        </div>
-
-        <div class="section">
-            <h2>📄 Upload Mortgage Package</h2>
-            <div class="upload-area" id="uploadArea">
-                <h3>📁 Drop your PDF file here or click to browse</h3>
-                <p>Supports large PDF files - no size limits on local processing</p>
-                <p style="font-size: 12px; color: #666;">Files are processed locally and never leave your machine</p>
-                <input type="file" id="fileInput" class="file-input" accept=".pdf">
-            </div>
-            
-            <div class="progress-container" id="progressContainer">
-                <div class="progress-bar">
-                    <div class="progress-fill" id="progressFill"></div>
-                </div>
-                <div class="progress-text" id="progressText">Processing...</div>
-            </div>
-        </div>
-
-        <div class="results" id="results">
-            <div class="section">
-                <h2>📋 Identified Sections</h2>
-                <div class="controls">
-                    <button class="btn" onclick="selectAll()">Select All</button>
-                    <button class="btn" onclick="selectNone()">Select None</button>
-                    <button class="btn" onclick="selectHighConfidence()">Select High Confidence</button>
-                    <button class="btn" onclick="generateTOC()">Generate Table of Contents</button>
-                </div>
-                <div class="section-grid" id="sectionsContainer">
-                    <!-- Sections will be populated here -->
-                </div>
-            </div>
-        </div>
-    </div>
-
-    <script>
-        console.log('🏠 Local Mortgage Analyzer Loading...');
-        
-        let currentSections = [];
-        let currentSessionId = null;
-
-        document.addEventListener('DOMContentLoaded', function() {
-            console.log('✅ Local version loaded successfully');
-            setupEventListeners();
-            checkDependencies();
-        });
-
-        function setupEventListeners() {
-            const uploadArea = document.getElementById('uploadArea');
-            const fileInput = document.getElementById('fileInput');
-
-            uploadArea.addEventListener('click', () => fileInput.click());
-            fileInput.addEventListener('change', handleFileSelect);
-
-            // Drag and drop
-            uploadArea.addEventListener('dragover', function(e) {
-                e.preventDefault();
-                uploadArea.classList.add('dragover');
-            });
-
-            uploadArea.addEventListener('dragleave', function() {
-                uploadArea.classList.remove('dragover');
-            });
-
-            uploadArea.addEventListener('drop', function(e) {
-                e.preventDefault();
-                uploadArea.classList.remove('dragover');
-                const files = e.dataTransfer.files;
-                if (files.length > 0) {
-                    handleFile(files[0]);
-                }
-            });
-        }
-
-        function checkDependencies() {
-            fetch('/api/health')
-                .then(response => response.json())
-                .then(data => {
-                    const status = document.getElementById('dependencyStatus');
-                    if (data.ocr_available && data.pdfplumber_available) {
-                        status.innerHTML = '<span style="color: #28a745;">✅ Full OCR Capabilities</span>';
-                    } else if (data.pdfplumber_available) {
-                        status.innerHTML = '<span style="color: #ffc107;">⚠️ Text Extraction Only</span>';
-                    } else {
-                        status.innerHTML = '<span style="color: #dc3545;">❌ Limited Capabilities</span>';
-                    }
-                })
-                .catch(() => {
-                    document.getElementById('dependencyStatus').innerHTML = '<span style="color: #dc3545;">❌ Server Error</span>';
-                });
-        }
-
-        function handleFileSelect(event) {
-            const file = event.target.files[0];
-            if (file) {
-                handleFile(file);
-            }
-        }
-
-        function handleFile(file) {
-            console.log('📄 Processing file:', file.name);
-            
-            if (!file.name.toLowerCase().endsWith('.pdf')) {
-                showError('Please select a PDF file.');
-                return;
-            }
-
-            uploadAndAnalyze(file);
-        }
-
-        function uploadAndAnalyze(file) {
-            console.log('🚀 Starting local analysis...');
-            
-            const formData = new FormData();
-            formData.append('file', file);
-
-            // Show progress
-            document.getElementById('progressContainer').style.display = 'block';
-            document.getElementById('results').style.display = 'none';
-            updateProgress(0, 'Starting analysis...');
-
-            fetch('/api/analyze', {
-                method: 'POST',
-                body: formData
-            })
-            .then(response => {
-                console.log('📡 Response status:', response.status);
-                if (!response.ok) {
-                    return response.json().then(err => {
-                        throw new Error('HTTP ' + response.status + ': ' + JSON.stringify(err));
-                    });
-                }
-                return response.json();
-            })
-            .then(data => {
-                console.log('✅ Analysis response:', data);
-                
-                if (data.error) {
-                    throw new Error(data.error);
-                }
-
-                currentSections = data.sections || [];
-                currentSessionId = data.session_id;
-                
-                updateProgress(100, 'Analysis complete!');
-                setTimeout(() => {
-                    document.getElementById('progressContainer').style.display = 'none';
-                    displayResults(currentSections, data);
-                    showSuccess(`Analysis complete! Found ${currentSections.length} sections in ${data.total_pages} pages.`);
-                }, 1000);
-            })
-            .catch(error => {
-                console.error('❌ Analysis error:', error);
-                document.getElementById('progressContainer').style.display = 'none';
-                showError('Error analyzing document: ' + error.message);
-            });
-        }
-
-        function updateProgress(percentage, text) {
-            document.getElementById('progressFill').style.width = percentage + '%';
-            document.getElementById('progressText').textContent = text;
-        }
-
-        function displayResults(sections, metadata) {
-            console.log('📋 Displaying results:', sections);
-            
-            const container = document.getElementById('sectionsContainer');
-            const resultsDiv = document.getElementById('results');
-            
-            if (!sections || sections.length === 0) {
-                container.innerHTML = '<div class="error">No sections identified in the document.</div>';
-                resultsDiv.style.display = 'block';
-                return;
-            }
-
-            let html = '';
-            sections.forEach((section, index) => {
-                html += `
-                    <div class="section-card confidence-${section.confidence}">
-                        <div style="display: flex; align-items: center; gap: 10px;">
-                            <input type="checkbox" id="section-${index}" checked>
-                            <label for="section-${index}" class="section-title">${section.section_type}</label>
-                        </div>
-                        <div class="section-meta">
-                            Page ${section.page} • ${section.confidence} confidence
-                            ${section.pattern_matched ? ' • Pattern: "' + section.pattern_matched + '"' : ''}
-                        </div>
-                        <div class="section-snippet">
-                            "${section.text_snippet}"
-                        </div>
-                    </div>
-                `;
-            });
-
-            // Add metadata info
-            html += `
-                <div class="section-card" style="border-left: 4px solid #17a2b8;">
-                    <div class="section-title">📊 Processing Summary</div>
-                    <div class="section-meta">
-                        Total Pages: ${metadata.total_pages} • 
-                        Text Items: ${metadata.total_text_items} • 
-                        OCR Available: ${metadata.ocr_available ? 'Yes' : 'No'} •
-                        Method: ${metadata.processing_method}
-                    </div>
-                </div>
-            `;
-
-            container.innerHTML = html;
-            resultsDiv.style.display = 'block';
-        }
-
-        function selectAll() {
-            document.querySelectorAll('#sectionsContainer input[type="checkbox"]').forEach(cb => cb.checked = true);
-        }
-
-        function selectNone() {
-            document.querySelectorAll('#sectionsContainer input[type="checkbox"]').forEach(cb => cb.checked = false);
-        }
-
-        function selectHighConfidence() {
-            document.querySelectorAll('#sectionsContainer input[type="checkbox"]').forEach((cb, index) => {
-                cb.checked = currentSections[index] && currentSections[index].confidence === 'high';
-            });
-        }
-
-        function generateTOC() {
-            const selectedSections = [];
-            document.querySelectorAll('#sectionsContainer input[type="checkbox"]:checked').forEach((checkbox, index) => {
-                const sectionIndex = parseInt(checkbox.id.split('-')[1]);
-                if (currentSections[sectionIndex]) {
-                    selectedSections.push(currentSections[sectionIndex]);
-                }
-            });
-
-            if (selectedSections.length === 0) {
-                showError('Please select at least one section.');
-                return;
-            }
-
-            // Sort by page number
-            selectedSections.sort((a, b) => a.page - b.page);
-
-            // Generate professional TOC
-            let toc = 'MORTGAGE PACKAGE - TABLE OF CONTENTS\\n';
-            toc += '=' * 50 + '\\n\\n';
-            toc += 'Generated: ' + new Date().toLocaleString() + '\\n';
-            toc += 'Processing: Local Server (Private)\\n\\n';
-            
-            selectedSections.forEach((section, index) => {
-                const pageStr = `Page ${section.page}`.padStart(10);
-                toc += `${(index + 1).toString().padStart(2)}. ${section.section_type.padEnd(40, '.')} ${pageStr}\\n`;
-            });
-
-            toc += '\\n' + '=' * 50 + '\\n';
-            toc += `Total Sections: ${selectedSections.length}\\n`;
-
-            // Create downloadable file
-            const blob = new Blob([toc], { type: 'text/plain' });
-            const url = URL.createObjectURL(blob);
-            const a = document.createElement('a');
-            a.href = url;
-            a.download = 'mortgage_package_toc.txt';
-            document.body.appendChild(a);
-            a.click();
-            document.body.removeChild(a);
-            URL.revokeObjectURL(url);
-
-            showSuccess(`Table of Contents generated and downloaded! (${selectedSections.length} sections)`);
-        }
-
-        function showError(message) {
-            console.error('❌ Error:', message);
-            const errorDiv = document.createElement('div');
-            errorDiv.className = 'error';
-            errorDiv.textContent = message;
-            document.querySelector('.container').appendChild(errorDiv);
-            setTimeout(() => errorDiv.remove(), 8000);
-        }
-
-        function showSuccess(message) {
-            console.log('✅ Success:', message);
-            const successDiv = document.createElement('div');
-            successDiv.className = 'success';
-            successDiv.textContent = message;
-            document.querySelector('.container').appendChild(successDiv);
-            setTimeout(() => successDiv.remove(), 5000);
-        }
-    </script>
-</body>
-</html>
-'''
-
 if __name__ == '__main__':
     print("=" * 60)
     print("🏠 MORTGAGE PACKAGE ANALYZER - LOCAL SERVER")
@@ -877,7 +925,12 @@ if __name__ == '__main__':
     print("=" * 60)
     
     try:
-        app.run(host='127.0.0.1', port=5000, debug=False)
+        try:
+            from waitress import serve
+            serve(app, host='127.0.0.1', port=5000, threads=8)
+        except ImportError:
+            print("⚠️ waitress not installed - falling back to the Flask dev server")
+            app.run(host='127.0.0.1', port=5000, threaded=True, debug=False)
     except KeyboardInterrupt:
         print("\\n🛑 Server stopped by user")
     except Exception as e: